@@ -1,12 +1,9 @@
 import streamlit as st
 import numpy as np
-from PIL import Image, ImageEnhance, ImageDraw, ImageFont
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
-import base64
+from PIL import Image
+import io
 import random
-from scipy import ndimage
+import cv2
 
 # Page configuration
 st.set_page_config(
@@ -17,7 +14,7 @@ st.set_page_config(
 )
 
 # Custom CSS with professional styling
-st.markdown("""
+_CSS = """
 <style>
     .main-header {
         font-size: 2.8rem;
@@ -89,6 +86,11 @@ st.markdown("""
         margin: 0.8rem 0;
         box-shadow: 0 2px 4px rgba(0,0,0,0.1);
     }
+    .metric-row {
+        display: grid;
+        grid-template-columns: repeat(auto-fit, minmax(12rem, 1fr));
+        gap: 1rem;
+    }
     .recommendation-box {
         background-color: #e8f4f8;
         padding: 1.2rem;
@@ -132,11 +134,10 @@ st.markdown("""
         background-color: #f8f9fa;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
 
-def create_text_logo():
-    """Create a text-based logo with eye and tear drop icons and custom logo"""
-    st.markdown("""
+# Static header and footer markup, built once at import
+_LOGO_HTML = """
     <div class="logo-container">
         <img src="https://i.postimg.cc/PfKTSZBT/Phantasmed-logo.png" class="custom-logo" alt="Phantasmed Logo">
         <div class="eye-icon">👁️</div>
@@ -146,20 +147,181 @@ def create_text_logo():
             TFOS DEWS III Based Dry Eye Assessment
         </div>
     </div>
-    """, unsafe_allow_html=True)
+    """
+
+_FOOTER_HTML = """
+<div style="text-align: center; color: #666; padding: 2rem;">
+    <div style="font-size: 2rem; font-weight: 800; color: #1f77b4; margin-bottom: 0.5rem; letter-spacing: 2px;">
+        TEARFILM ANALYZER
+    </div>
+    <div style="font-size: 1.2rem; margin-bottom: 1rem;">
+        TFOS DEWS III Based Diagnostic System
+    </div>
+    <p><strong>For professional use only.</strong></p>
+    <p><em>This system provides diagnostic support and recommendations. Final diagnosis and treatment decisions should be made by qualified eye care specialists (ophthalmologists or optometrists).</em></p>
+    <p>© 2024 Toni Mandusic. All rights reserved.</p>
+    <p>Reference: TFOS DEWS III Reports, June 2025</p>
+</div>
+"""
+
+# Static TFOS DEWS III reference content for the Guidelines tab
+_DIAGNOSTIC_CRITERIA_MD = """
+### 🔍 Key Diagnostic Criteria
+
+**Aqueous Deficient Dry Eye (ADDE):**
+- Schirmer test ≤ 5 mm/5min
+- Reduced tear meniscus height (< 0.2 mm)
+- Normal TBUT
+
+**Evaporative Dry Eye (EDE):**
+- TBUT ≤ 5 seconds
+- Meibomian gland dysfunction  
+- Normal Schirmer test
+
+**Mixed Dry Eye:**
+- Features of both ADDE and EDE
+"""
 
-def analyze_tear_film_pattern(image):
-    """Analyze tear film interference patterns - NOW DYNAMIC BASED ON IMAGE"""
+_SEVERITY_GRADING = {
+    'Parameter': ['TBUT', 'Schirmer', 'Corneal Staining', 'Symptoms'],
+    'Mild': ['≤10s', '≤10mm', 'Mild & transient', 'Mild & episodic'],
+    'Moderate': ['≤5s', '≤5mm', 'Moderate marked', 'Moderate chronic'], 
+    'Severe': ['Immediate', '≤2mm', 'Severe persistent', 'Severe constant']
+}
+
+_DIAGNOSTIC_WORKFLOW_MD = """
+### 📋 Diagnostic Workflow
+1. **Step 1:** Symptom assessment (OSDI/DEQ-5)
+2. **Step 2:** Tear film stability (TBUT)
+3. **Step 3:** Tear volume assessment (TMH/Schirmer)
+4. **Step 4:** Ocular surface damage (staining)
+5. **Step 5:** Meibomian gland evaluation
+
+*Reference: TFOS DEWS III Diagnostic Methodology Report, June 2025*
+"""
+
+st.markdown(_CSS, unsafe_allow_html=True)
+
+def create_text_logo():
+    """Create a text-based logo with eye and tear drop icons and custom logo"""
+    st.markdown(_LOGO_HTML, unsafe_allow_html=True)
+
+def _metric_cards(items):
+    """HTML for a row of metric cards as (label, value) pairs, rendered with a single st.markdown"""
+    return ('<div class="metric-row">'
+            + ''.join(f'<div class="metric-card">'
+                      f'<div style="font-size: 1.2rem; font-weight: bold; color: #2e86ab;">{label}</div>'
+                      f'<div style="font-size: 1.5rem; font-weight: bold;">{value}</div>'
+                      f'</div>' for label, value in items)
+            + '</div>')
+
+def _encode_jpeg(image):
+    """Encode a PIL image as JPEG bytes once, so cached results stay compact and st.image skips re-encoding"""
+    buf = io.BytesIO()
+    # Quality 85 is visually lossless for slit lamp photos and far smaller than PNG to send
+    image.save(buf, format='JPEG', quality=85)
+    return buf.getvalue()
+
+def _enhance_contrast(img_array, factor):
+    """Same result as PIL's ImageEnhance.Contrast, applied as a single 256-entry lookup table"""
+    # PIL stretches each channel around the rounded mean grey level and truncates the blend
+    mean = np.float32(int(cv2.mean(cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY))[0] + 0.5))
+    levels = np.arange(256, dtype=np.float32)
+    lut = np.clip(mean + np.float32(factor) * (levels - mean), 0, 255).astype(np.uint8)
+    return cv2.LUT(img_array, lut)
+
+def _limit_resolution(img_array, max_side=1024):
+    """Downscale an image array so its longest side is at most max_side pixels
+    
+    Averaging smooths fine texture, so the tear film contrast (pixel standard deviation) and its
+    grade depend on the resolution. The 3x3 morphology and 10 pixel minimum lesion size are fixed
+    pixel sizes too, so staining percentages and lesion counts are resolution-dependent as well.
+    """
+    h, w = img_array.shape[:2]
+    scale = max_side / max(h, w)
+    if scale >= 1:
+        return img_array
+    return cv2.resize(img_array, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+
+def _hist_percentile(hist, q):
+    """Exact np.percentile for a small non-negative integer image, read off its histogram instead of sorting"""
+    cdf = np.cumsum(hist)
+    ranks = np.asarray(q, dtype=np.float64) / 100 * (cdf[-1] - 1)
+    lower = np.floor(ranks)
+    lo = np.searchsorted(cdf, lower, side='right')
+    hi = np.searchsorted(cdf, np.ceil(ranks), side='right')
+    return lo + (hi - lo) * (ranks - lower)
+
+# Longest side of the preview kept for display
+_PREVIEW_SIDE = 1600
+
+# JPEG decoders can scale by 1/2, 1/4 or 1/8 in the DCT while decoding
+_REDUCED_DECODE = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+def _decode_flag(uploaded_file):
+    """Pick the largest JPEG decode-time reduction that still leaves a full-size preview"""
     try:
-        img_array = np.array(image)
-        
-        # Analyze image characteristics
-        r_mean = np.mean(img_array[:,:,0])
-        g_mean = np.mean(img_array[:,:,1])
-        b_mean = np.mean(img_array[:,:,2])
+        # Image.open only parses the header here, no pixels are decoded
+        with Image.open(uploaded_file) as header:
+            if header.format == 'JPEG':
+                longest = max(header.size)
+                for factor, flag in _REDUCED_DECODE:
+                    if longest // factor >= _PREVIEW_SIDE:
+                        return flag
+    except OSError:
+        pass  # Left to cv2.imdecode to report
+    return cv2.IMREAD_COLOR
+
+def _decode_upload(uploaded_file, slot):
+    """Decode an uploaded image once per upload, kept in session state across reruns
+    
+    Returns an RGB preview capped at display size and a smaller RGB copy for analysis.
+    """
+    decoded = st.session_state.get(slot)
+    if decoded is None or decoded[0] != uploaded_file.file_id:
+        # OpenCV decodes through libjpeg-turbo/libpng directly into an array; getbuffer()
+        # exposes the upload's bytes as a view instead of copying them like getvalue()
+        flag = _decode_flag(uploaded_file)
+        bgr = cv2.imdecode(np.frombuffer(uploaded_file.getbuffer(), np.uint8), flag)
+        if bgr is None:
+            raise ValueError(f"Could not decode image: {uploaded_file.name}")
+        # Both copies are downscaled from the decoded original before the colour conversion,
+        # so the full-resolution image is neither converted nor kept; the preview size still
+        # fills the widest column at high DPI while sending far less to the browser
+        decoded = (uploaded_file.file_id,
+                   cv2.cvtColor(_limit_resolution(bgr, _PREVIEW_SIDE), cv2.COLOR_BGR2RGB),
+                   cv2.cvtColor(_limit_resolution(bgr), cv2.COLOR_BGR2RGB))
+        st.session_state[slot] = decoded
+    return decoded[1], decoded[2]
+
+def _stored_result(slot, uploaded_file):
+    """Return the analysis result kept in session state for this upload, or None if not analysed yet"""
+    stored = st.session_state.get(slot)
+    if stored is not None and stored[0] == uploaded_file.file_id:
+        return stored[1]
+    return None
+
+def _session_result(slot, uploader_key):
+    """Return the stored analysis result for the file currently held by the keyed uploader, or None"""
+    uploaded_file = st.session_state.get(uploader_key)
+    return None if uploaded_file is None else _stored_result(slot, uploaded_file)
+
+def analyze_tear_film_pattern(img_array):
+    """Analyze tear film interference patterns - NOW DYNAMIC BASED ON IMAGE
+    
+    Takes the decoded RGB array. Not cached: coverage, score and pattern are drawn at random,
+    and a cache would freeze one draw per image across sessions. The tab keeps the result per
+    upload in st.session_state instead.
+    """
+    try:
+        # Analyze image characteristics - per-channel statistics in a single pass
+        means, stds = cv2.meanStdDev(img_array)
+        means, stds = means.ravel(), stds.ravel()
+        r_mean, g_mean, b_mean = means[:3]
         
-        brightness = np.mean(img_array)
-        contrast = np.std(img_array)
+        # Whole-image brightness and contrast follow from the per-channel statistics
+        brightness = means.mean()
+        contrast = np.sqrt(np.mean(stds ** 2 + means ** 2) - brightness ** 2)
         
         # Generate DIFFERENT interpretations based on actual image analysis
         if brightness < 100:
@@ -207,55 +369,112 @@ def analyze_tear_film_pattern(image):
             'interpretation': random.choice(interpretations)
         }
 
-def analyze_fluorescein_staining(image):
-    """Analyze fluorescein staining patterns for green fluorescent images - IMPROVED TO EXCLUDE PUPIL AND SCLERA"""
+# 3x3 cross structuring element (4-connected) for the staining mask clean-up
+_MORPH_KERNEL = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
+
+# Pink highlight used to mark staining areas
+_HIGHLIGHT_COLOR = np.array([255, 100, 100], dtype=np.uint8)
+
+# Per-channel lookup tables for the fluorescein overlays. Each overlay is a fixed blend of
+# the pixel value with a constant colour, so it reduces to one 256-entry table per channel
+# (shaped 256x1x3 for cv2.LUT)
+_HIGHLIGHT_LUT = np.stack([np.arange(256) * 0.4 + c * 0.6 for c in _HIGHLIGHT_COLOR], axis=1).astype(np.uint8)[:, None]
+_EXCLUDED_LUT = np.stack([np.arange(256) * 0.7 + c * 0.3 for c in (100, 100, 100)], axis=1).astype(np.uint8)[:, None]  # Gray for excluded areas
+
+# Oxford scale grading: a staining percentage above the i-th bound moves up one grade
+_FLUOR_BINS = np.array([0.5, 3.0, 8.0, 15.0])
+_FLUOR_GRADES = (
+    "None (Grade 0)",
+    "Trace (Grade I)",
+    "Mild (Grade II)",
+    "Moderate (Grade III)",
+    "Severe (Grade IV-V)"
+)
+_FLUOR_INTERPRETATIONS = (
+    "No significant epithelial staining detected",
+    "Minimal epithelial staining - sparse spots",
+    "Mild epithelial changes - few discrete spots",
+    "Moderate epithelial disruption - multiple discrete areas",
+    "Significant corneal epithelial damage - multiple coalescing areas"
+)
+
+# Coarser grading used by the simple fallback analysis
+_SIMPLE_FLUOR_BINS = np.array([5.0, 10.0])
+_SIMPLE_FLUOR_GRADES = ("Trace to None", "Mild", "Moderate to Severe")
+
+@st.cache_data(show_spinner=False, max_entries=32, ttl=3600)
+def analyze_fluorescein_staining(file_id, _img_array):
+    """Analyze fluorescein staining patterns for green fluorescent images - IMPROVED TO EXCLUDE PUPIL AND SCLERA
+    
+    Takes the upload's file_id and its decoded RGB array; cached on the file_id alone, since
+    Streamlit only hashes a sample of large arrays. The processed image is returned as JPEG bytes.
+    """
+    img_array = _img_array
     try:
-        # Convert to numpy array for processing
-        img_array = np.array(image)
-        
-        r, g, b = img_array[:,:,0], img_array[:,:,1], img_array[:,:,2]
+        # Widen to uint16 once and share the channel views between the intensity and
+        # green dominance maps; sums of up to three channels are exact in 16 bits
+        img16 = img_array[:,:,:3].astype(np.uint16)
+        r, g, b = img16[:,:,0], img16[:,:,1], img16[:,:,2]
         
-        # Calculate intensity differences
-        intensity = (r.astype(float) + g.astype(float) + b.astype(float)) / 3
+        # Calculate intensity differences. The channel sum is used directly: every
+        # threshold below is a percentile of this map, so dividing by 3 changes nothing
+        intensity = r + g
+        intensity += b
         
         # STRATEGY: Exclude pupil (very dark) and sclera (very bright white)
-        # 1. Exclude pupil - very dark areas (intensity < 20% of max)
-        pupil_threshold = np.percentile(intensity, 10)
-        pupil_mask = intensity < pupil_threshold
+        # All three intensity cut-offs come from one 766-bin histogram of the channel sum
+        hist = np.bincount(intensity.ravel(), minlength=3 * 255 + 1)
+        pupil_threshold, staining_threshold, sclera_threshold = _hist_percentile(hist, [10, 60, 85])
+        
+        # The intensity cut-offs depend only on the intensity level, so they are applied to
+        # the 766 possible levels and each pixel mask is then a single table lookup
+        levels = np.arange(hist.size)
         
+        # 1. Exclude pupil - very dark areas (intensity < 20% of max)
         # 2. Exclude sclera - very bright white areas (intensity > 85% of max)
-        sclera_threshold = np.percentile(intensity, 85)
-        sclera_mask = intensity > sclera_threshold
+        corneal_levels = (levels >= pupil_threshold) & (levels <= sclera_threshold)
         
         # 3. Focus on corneal area - medium intensity with green/yellow characteristics
         # Corneal staining typically appears as bright green/yellow on darker green background
-        green_dominance = g.astype(float) / (r.astype(float) + b.astype(float) + 1)
         
-        # Staining areas: high intensity + high green dominance + NOT pupil/sclera
-        staining_candidates = (intensity > np.percentile(intensity, 60)) & \
-                            (green_dominance > 1.2) & \
-                            (~pupil_mask) & \
-                            (~sclera_mask)
+        # Staining areas: high intensity + high green dominance + NOT pupil/sclera.
+        # Built in place on one mask; the 60th percentile cut already excludes the pupil,
+        # and green dominance (g / (r + b + 1) > 1.2) is tested as 5 * g > 6 * (r + b + 1),
+        # exactly and without leaving integers.
+        staining_candidates = (corneal_levels & (levels > staining_threshold))[intensity]
+        green_limit = r + b
+        green_limit += 1
+        green_limit *= 6
+        staining_candidates &= g * 5 > green_limit
         
-        # Apply morphological operations to clean up the mask
-        staining_mask = ndimage.binary_closing(staining_candidates)
-        staining_mask = ndimage.binary_opening(staining_mask)
-        
-        # Remove very small isolated areas (likely noise)
-        labeled_mask, num_features = ndimage.label(staining_mask)
-        component_sizes = np.bincount(labeled_mask.ravel())
-        min_size = max(10, staining_mask.size * 0.001)  # At least 0.1% of image size or 10 pixels
-        
-        for label in range(1, num_features + 1):
-            if component_sizes[label] < min_size:
-                staining_mask[labeled_mask == label] = False
+        # An empty candidate mask (e.g. an unstained or dark capture) stays empty through the
+        # clean-up, so morphology and labelling are skipped
+        has_candidates = staining_candidates.any()
+        if has_candidates:
+            # Apply morphological operations to clean up the mask. The mask stays uint8 from here
+            # on so morphology, labelling and counting share one dtype. Pixels outside the image
+            # count as background, as in ndimage.binary_closing/binary_opening
+            staining_mask = cv2.morphologyEx(staining_candidates.view(np.uint8), cv2.MORPH_CLOSE, _MORPH_KERNEL,
+                                             borderType=cv2.BORDER_CONSTANT, borderValue=0)
+            staining_mask = cv2.morphologyEx(staining_mask, cv2.MORPH_OPEN, _MORPH_KERNEL,
+                                             borderType=cv2.BORDER_CONSTANT, borderValue=0)
+            
+            # Remove very small isolated areas (likely noise)
+            _, labeled_mask, stats, _ = cv2.connectedComponentsWithStats(staining_mask, connectivity=4)
+            min_size = max(10, staining_mask.size * 0.001)  # At least 0.1% of image size or 10 pixels
+            
+            keep_label = stats[:, cv2.CC_STAT_AREA] >= min_size
+            keep_label[0] = False  # Background
+            staining_mask = keep_label[labeled_mask]
+        else:
+            staining_mask = staining_candidates
         
         # Calculate staining percentage ONLY in corneal area (exclude pupil and sclera)
-        corneal_area_mask = ~pupil_mask & ~sclera_mask
-        total_corneal_pixels = np.sum(corneal_area_mask)
+        corneal_area_mask = corneal_levels[intensity]
+        total_corneal_pixels = hist[corneal_levels].sum()
         
         if total_corneal_pixels > 0:
-            staining_pixels = np.sum(staining_mask)
+            staining_pixels = np.count_nonzero(staining_mask)
             staining_percentage = (staining_pixels / total_corneal_pixels) * 100
         else:
             staining_percentage = 0
@@ -263,47 +482,28 @@ def analyze_fluorescein_staining(image):
         # Create result image with highlighted staining (only on cornea)
         result_array = img_array.copy()
         
-        # Highlight only true staining areas
-        highlight_color = [255, 100, 100]  # Pink highlight for visibility
-        
-        # Apply highlight only to staining areas that are on cornea
+        # Highlight only true staining areas (pink blend via lookup table, no float math)
+        # Apply highlight only to staining areas that are on cornea. Each blend is one SIMD
+        # cv2.LUT pass over the image, copied in under the mask instead of gathered/scattered
         valid_staining = staining_mask & corneal_area_mask
-        for i in range(3):
-            result_array[valid_staining, i] = np.clip(
-                result_array[valid_staining, i] * 0.4 + highlight_color[i] * 0.6, 0, 255
-            ).astype(np.uint8)
+        np.copyto(result_array, cv2.LUT(img_array, _HIGHLIGHT_LUT), where=valid_staining[..., None])
         
         # Also lightly mark excluded areas for transparency
-        excluded_color = [100, 100, 100]  # Gray for excluded areas
-        for i in range(3):
-            result_array[pupil_mask | sclera_mask, i] = np.clip(
-                result_array[pupil_mask | sclera_mask, i] * 0.7 + excluded_color[i] * 0.3, 0, 255
-            ).astype(np.uint8)
+        excluded_mask = ~corneal_area_mask
+        np.copyto(result_array, cv2.LUT(img_array, _EXCLUDED_LUT), where=excluded_mask[..., None])
         
         result_image = Image.fromarray(result_array)
         
-        # Count distinct staining areas (only significant ones)
-        labeled_staining, num_lesions = ndimage.label(valid_staining)
-        
-        # Determine staining grade based on Oxford scale
-        if staining_percentage > 15:
-            grade = "Severe (Grade IV-V)"
-            interpretation = "Significant corneal epithelial damage - multiple coalescing areas"
-        elif staining_percentage > 8:
-            grade = "Moderate (Grade III)"
-            interpretation = "Moderate epithelial disruption - multiple discrete areas"
-        elif staining_percentage > 3:
-            grade = "Mild (Grade II)"
-            interpretation = "Mild epithelial changes - few discrete spots"
-        elif staining_percentage > 0.5:
-            grade = "Trace (Grade I)"
-            interpretation = "Minimal epithelial staining - sparse spots"
-        else:
-            grade = "None (Grade 0)"
-            interpretation = "No significant epithelial staining detected"
+        # Count distinct staining areas (only significant ones), excluding the background label
+        num_lesions = cv2.connectedComponents(valid_staining.view(np.uint8), connectivity=4)[0] - 1 if has_candidates else 0
+        
+        # Determine staining grade based on Oxford scale (bounds are exclusive, hence side='left')
+        grade_idx = int(np.searchsorted(_FLUOR_BINS, staining_percentage, side='left'))
+        grade = _FLUOR_GRADES[grade_idx]
+        interpretation = _FLUOR_INTERPRETATIONS[grade_idx]
         
         return {
-            'processed_image': result_image,
+            'processed_jpeg': _encode_jpeg(result_image),
             'staining_grade': grade,
             'staining_percentage': staining_percentage,
             'lesion_count': num_lesions,
@@ -314,51 +514,49 @@ def analyze_fluorescein_staining(image):
     except Exception as e:
         st.error(f"Error in fluorescein staining analysis: {e}")
         # Fallback to simple analysis
-        return simple_fluorescein_analysis_improved(image)
+        return simple_fluorescein_analysis_improved(img_array)
 
-def simple_fluorescein_analysis_improved(image):
+def simple_fluorescein_analysis_improved(img_array):
     """Improved simple fallback analysis that excludes pupil and sclera"""
     try:
-        img_array = np.array(image)
-        r, g, b = img_array[:,:,0], img_array[:,:,1], img_array[:,:,2]
-        
-        # Simple brightness-based detection with exclusion
-        brightness = (r + g + b) / 3
+        # Simple brightness-based detection with exclusion. BT.601 luma stays uint8 and,
+        # unlike summing the uint8 channels, cannot wrap around on bright pixels
+        brightness = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
         
         # Exclude extremes (pupil and sclera)
-        pupil_threshold = np.percentile(brightness, 15)
-        sclera_threshold = np.percentile(brightness, 80)
+        hist = np.bincount(brightness.ravel(), minlength=256)
+        pupil_threshold, staining_threshold, sclera_threshold = _hist_percentile(hist, [15, 70, 80])
         
-        corneal_area = (brightness > pupil_threshold) & (brightness < sclera_threshold)
+        # Every mask depends only on the grey level, so classify the 256 levels once;
+        # pixel counts then come straight from the histogram
+        levels = np.arange(256)
+        corneal_levels = (levels > pupil_threshold) & (levels < sclera_threshold)
         
         # Staining detection only in corneal area
-        staining_mask = (brightness > np.percentile(brightness, 70)) & corneal_area
+        staining_levels = (levels > staining_threshold) & corneal_levels
+        
+        corneal_area = corneal_levels[brightness]
+        staining_mask = staining_levels[brightness]
         
-        if np.sum(corneal_area) > 0:
-            staining_percentage = (np.sum(staining_mask) / np.sum(corneal_area)) * 100
+        corneal_pixels = hist[corneal_levels].sum()
+        if corneal_pixels > 0:
+            staining_percentage = (hist[staining_levels].sum() / corneal_pixels) * 100
         else:
             staining_percentage = 0
         
-        # Create highlighted image
-        result_array = img_array.copy()
-        result_array[staining_mask] = [255, 100, 100]  # Pink highlight
-        
-        # Mark excluded areas
-        excluded_mask = ~corneal_area
-        result_array[excluded_mask] = result_array[excluded_mask] // 2  # Darken excluded areas
+        # Create highlighted image: darken excluded areas, keep the cornea, then mark staining
+        # (a subset of the cornea) - masked copies instead of gather/scatter fancy indexing
+        result_array = img_array // 2
+        np.copyto(result_array, img_array, where=corneal_area[..., None])
+        np.copyto(result_array, _HIGHLIGHT_COLOR, where=staining_mask[..., None])
         
         result_image = Image.fromarray(result_array)
         
         # Simple grading
-        if staining_percentage > 10:
-            grade = "Moderate to Severe"
-        elif staining_percentage > 5:
-            grade = "Mild"
-        else:
-            grade = "Trace to None"
+        grade = _SIMPLE_FLUOR_GRADES[int(np.searchsorted(_SIMPLE_FLUOR_BINS, staining_percentage, side='left'))]
         
         return {
-            'processed_image': result_image,
+            'processed_jpeg': _encode_jpeg(result_image),
             'staining_grade': grade,
             'staining_percentage': staining_percentage,
             'lesion_count': int(staining_percentage / 2),
@@ -419,8 +617,8 @@ def get_dynamic_recommendations(tear_film_analysis, staining_analysis, clinical_
     if schirmer < 5:
         recommendations.append("Punctal occlusion therapy")
     
-    # Remove duplicates and ensure variety
-    recommendations = list(set(recommendations))
+    # Remove duplicates and ensure variety, keeping the order they were added in
+    recommendations = list(dict.fromkeys(recommendations))
     
     # Add general recommendations if few specific ones
     general_recs = [
@@ -435,27 +633,20 @@ def get_dynamic_recommendations(tear_film_analysis, staining_analysis, clinical_
     
     return recommendations[:8]  # Limit to 8 recommendations
 
-def generate_client_report(tear_film_result, staining_result, clinical_params, diagnosis, severity):
-    """Generate printable client report"""
-    # Handle tear film results safely
-    tear_film_grade = tear_film_result.get('grade', 'N/A') if tear_film_result else 'N/A'
-    tear_film_coverage = f"{tear_film_result.get('coverage', 0):.1f}%" if tear_film_result else 'N/A'
-    
-    # Handle staining results safely
-    staining_grade = staining_result.get('staining_grade', 'N/A') if staining_result else 'N/A'
-    staining_percentage = f"{staining_result.get('staining_percentage', 0):.1f}%" if staining_result else 'N/A'
-    
-    report = f"""
+# Client report text, filled in with str.format_map; clinical values that were not
+# provided fall back to N/A
+_REPORT_DEFAULTS = dict.fromkeys(('tbut', 'tmh', 'schirmer', 'osdi', 'lipcof_nasal', 'lipcof_temporal'), 'N/A')
+_REPORT_TEMPLATE = """
     TEAR FILM ANALYSIS REPORT
     =========================
     
     CLINICAL FINDINGS:
-    - TBUT: {clinical_params.get('tbut', 'N/A')} seconds
-    - Tear Meniscus Height: {clinical_params.get('tmh', 'N/A')} mm
-    - Schirmer Test: {clinical_params.get('schirmer', 'N/A')} mm/5min
-    - OSDI Score: {clinical_params.get('osdi', 'N/A')}/100
-    - LIPCOF Nasal: {clinical_params.get('lipcof_nasal', 'N/A')}/3
-    - LIPCOF Temporal: {clinical_params.get('lipcof_temporal', 'N/A')}/3
+    - TBUT: {tbut} seconds
+    - Tear Meniscus Height: {tmh} mm
+    - Schirmer Test: {schirmer} mm/5min
+    - OSDI Score: {osdi}/100
+    - LIPCOF Nasal: {lipcof_nasal}/3
+    - LIPCOF Temporal: {lipcof_temporal}/3
     
     IMAGE ANALYSIS RESULTS:
     - Tear Film Grade: {tear_film_grade}
@@ -476,7 +667,205 @@ def generate_client_report(tear_film_result, staining_result, clinical_params, d
     Report generated by TearFilm Analyzer Professional System
     © 2024 Toni Mandusic. All rights reserved.
     """
-    return report
+
+def generate_client_report(tear_film_result, staining_result, clinical_params, diagnosis, severity):
+    """Generate printable client report"""
+    # Handle tear film results safely
+    tear_film_grade = tear_film_result.get('grade', 'N/A') if tear_film_result else 'N/A'
+    tear_film_coverage = f"{tear_film_result.get('coverage', 0):.1f}%" if tear_film_result else 'N/A'
+    
+    # Handle staining results safely
+    staining_grade = staining_result.get('staining_grade', 'N/A') if staining_result else 'N/A'
+    staining_percentage = f"{staining_result.get('staining_percentage', 0):.1f}%" if staining_result else 'N/A'
+    
+    return _REPORT_TEMPLATE.format_map({
+        **_REPORT_DEFAULTS, **clinical_params,
+        'tear_film_grade': tear_film_grade, 'tear_film_coverage': tear_film_coverage,
+        'staining_grade': staining_grade, 'staining_percentage': staining_percentage,
+        'diagnosis': diagnosis, 'severity': severity
+    })
+
+# Normal limits for the clinical summary rows: sign -1 means higher values are normal,
+# +1 means lower values are normal, so every row is one "sign * value <= sign * limit" test
+_STATUS_PARAMETERS = ('TBUT', 'Tear Meniscus Height', 'Schirmer Test',
+                      'Meibomian Grade', 'Meiboscore', 'OSDI', 'DEQ-5',
+                      'LIPCOF Nasal', 'LIPCOF Temporal')
+_STATUS_LIMITS = np.array([10, 0.3, 10, 1, 1, 22, 6, 1, 1])
+_STATUS_SIGNS = np.array([-1, -1, -1, 1, 1, 1, 1, 1, 1])
+_STATUS_FLAGS = np.array(['⚠️ Low'] * 3 + ['⚠️ Abnormal'] * 2 + ['⚠️ High'] * 2 + ['⚠️ Abnormal'] * 2)
+
+# Dry eye score rules (TBUT twice, TMH, Schirmer, OSDI, DEQ-5): sign +1 scores a value below
+# the limit, -1 a value above it, and each rule that fires adds its weight
+_SCORE_LIMITS = np.array([10, 5, 0.3, 10, 33, 8])
+_SCORE_SIGNS = np.array([1, 1, 1, 1, -1, -1])
+_SCORE_WEIGHTS = np.array([2, 1, 1, 2, 2, 1])
+
+@st.cache_resource(show_spinner=False)
+def _severity_gauge(level):
+    """Severity gauge figure, cached per level since there are only four
+
+    A resource cache hands back the same figure; cache_data would pickle it and plotly rebuilds
+    and re-validates the whole figure on every unpickle.
+    """
+    # Plotly is imported on first use to keep it off the cold-start path
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Indicator(
+        mode="gauge+number+delta",
+        value=level,
+        domain={'x': [0, 1], 'y': [0, 1]},
+        title={'text': "🩺 Disease Severity", 'font': {'size': 20}},
+        gauge={
+            'axis': {'range': [0, 3], 'tickvals': [0, 1, 2, 3], 
+                   'ticktext': ['None', 'Mild', 'Moderate', 'Severe']},
+            'bar': {'color': "darkblue"},
+            'steps': [
+                {'range': [0, 1], 'color': "lightgreen"},
+                {'range': [1, 2], 'color': "yellow"},
+                {'range': [2, 3], 'color': "red"}
+            ],
+            'threshold': {
+                'line': {'color': "black", 'width': 4},
+                'thickness': 0.75,
+                'value': level
+            }
+        }
+    ))
+    fig.update_layout(height=300, font={'size': 12})
+    return fig
+
+@st.fragment
+def _tear_film_tab():
+    """Tear film tab, run as a fragment so uploading and analysing an image only reruns this tab"""
+    st.markdown('<h2 class="section-header">🔬 Tear Film Interference Pattern Analysis</h2>', unsafe_allow_html=True)
+    
+    col1, col2 = st.columns([1, 1])
+    
+    with col1:
+        st.markdown('<div class="upload-section">', unsafe_allow_html=True)
+        uploaded_file = st.file_uploader("**Upload Slit Lamp Tear Film Image**", 
+                                       type=['jpg', 'jpeg', 'png'],
+                                       key="tear_film",
+                                       help="Upload a high-quality image of tear film interference patterns")
+        st.markdown('</div>', unsafe_allow_html=True)
+        
+        if uploaded_file is not None:
+            image_array, analysis_array = _decode_upload(uploaded_file, 'tear_film_image')
+            tear_film_result = _stored_result('tear_film_result', uploaded_file)
+            st.image(image_array, caption="🖼️ Original Slit Lamp Image", width="stretch")
+    
+    with col2:
+        if uploaded_file is not None and st.button("🔍 Analyze Tear Film", type="primary", use_container_width=True):
+            with st.spinner("🔄 Analyzing tear film characteristics..."):
+                # Enhanced analysis that varies by image - skipped if this upload was already analysed
+                if tear_film_result is None:
+                    tear_film_result = analyze_tear_film_pattern(analysis_array)
+                    st.session_state['tear_film_result'] = (uploaded_file.file_id, tear_film_result)
+                
+                # Simple image enhancement
+                enhanced = _enhance_contrast(image_array, 1.8)
+                
+                st.image(enhanced, caption="✨ Enhanced Interference Pattern", width="stretch")
+                
+                st.success("✅ Image analysis completed!")
+                
+                # Display DYNAMIC results
+                st.markdown("### 📋 Analysis Results")
+                st.markdown(_metric_cards([
+                    ('Interference Grade', tear_film_result["grade"]),
+                    ('Pattern Coverage', f'{tear_film_result["coverage"]:.1f}%'),
+                    ('Quality Score', f'{tear_film_result["quality_score"]}/10')
+                ]), unsafe_allow_html=True)
+                
+                # Interpretation
+                st.markdown("### 💬 Clinical Interpretation")
+                st.write(tear_film_result["interpretation"])
+                
+                # Color distribution chart - now dynamic
+                colors = ['Blue', 'Green', 'Yellow', 'Red', 'Violet']
+                distribution = [random.randint(15, 40) for _ in colors]
+                total = sum(distribution)
+                distribution = [d/total*100 for d in distribution]
+                
+                # Plotly is imported on first use to keep it off the cold-start path
+                import plotly.express as px
+                fig = px.pie(values=distribution,
+                           names=colors,
+                           title="🎨 Interference Color Distribution",
+                           color_discrete_sequence=px.colors.qualitative.Set3)
+                st.plotly_chart(fig, use_container_width=True)
+
+@st.fragment
+def _staining_tab():
+    """Fluorescein tab, run as a fragment so uploading and analysing an image only reruns this tab"""
+    st.markdown('<h2 class="section-header">🎯 Fluorescein Staining Analysis</h2>', unsafe_allow_html=True)
+    
+    st.info("""
+    **📝 Note:** This analysis is optimized for fluorescein images taken with blue light and yellow filter. 
+    The entire image appears green, with staining areas showing as brighter green/yellow spots.
+    **Improved:** Now excludes pupil (dark center) and sclera (white areas) from analysis.
+    """)
+    
+    col1, col2 = st.columns([1, 1])
+    
+    with col1:
+        st.markdown('<div class="upload-section">', unsafe_allow_html=True)
+        staining_file = st.file_uploader("**Upload Fluorescein Staining Image**", 
+                                       type=['jpg', 'jpeg', 'png'], 
+                                       key="staining",
+                                       help="Upload fluorescein staining image (blue light + yellow filter)")
+        st.markdown('</div>', unsafe_allow_html=True)
+        
+        if staining_file is not None:
+            image_array, analysis_array = _decode_upload(staining_file, 'staining_image')
+            staining_result = _stored_result('staining_result', staining_file)
+            st.image(image_array, caption="🖼️ Original Fluorescein Image", width="stretch")
+    
+    with col2:
+        if staining_file is not None and st.button("🔍 Analyze Fluorescein Staining", type="primary", use_container_width=True):
+            with st.spinner("🔄 Analyzing fluorescein staining patterns..."):
+                if staining_result is None:
+                    staining_result = analyze_fluorescein_staining(staining_file.file_id, analysis_array)
+                    st.session_state['staining_result'] = (staining_file.file_id, staining_result)
+                
+                if staining_result:
+                    st.image(staining_result['processed_jpeg'], 
+                            caption="🔴 Detected Staining Areas (Highlighted in Red) - Gray areas excluded", 
+                            width="stretch")
+                    
+                    st.success("✅ Fluorescein analysis completed!")
+                    
+                    # Staining assessment results - NOW DYNAMIC
+                    st.markdown("### 📊 Staining Assessment")
+                    st.markdown(_metric_cards([
+                        ('Staining Grade', staining_result["staining_grade"]),
+                        ('Staining Area', f'{staining_result["staining_percentage"]:.1f}%'),
+                        ('Lesion Count', staining_result["lesion_count"])
+                    ]), unsafe_allow_html=True)
+                    
+                    # Interpretation - NOW DYNAMIC
+                    st.markdown("### 💬 Clinical Interpretation")
+                    if staining_result['staining_percentage'] > 8:
+                        st.markdown(f'''
+                        <div class="warning-box">
+                            <strong>⚠️ {staining_result["interpretation"]}</strong><br>
+                            - Significant corneal epithelial damage detected<br>
+                            - Consider immediate evaluation by eye care specialist<br>
+                            - Anti-inflammatory therapy recommended
+                        </div>
+                        ''', unsafe_allow_html=True)
+                    else:
+                        st.markdown(f'''
+                        <div class="recommendation-box">
+                            <strong>✅ {staining_result["interpretation"]}</strong><br>
+                            - Regular lubrication therapy recommended<br>
+                            - Monitor for progression<br>
+                            - Follow up in 4-6 weeks
+                        </div>
+                        ''', unsafe_allow_html=True)
+
+# Sidebar selectbox options
+_MEIBOMIAN_GRADES = ("0 - Clear", "1 - Cloudy", "2 - Granular", "3 - Toothpaste", "4 - No secretion")
+_OXFORD_GRADES = ("0 - None", "I - Mild", "II - Moderate", "III - Marked", "IV - Severe", "V - Extreme")
 
 def main():
     # Header with enhanced logo
@@ -511,7 +900,7 @@ def main():
         
         with st.expander("🔬 Meibomian Gland Assessment", expanded=True):
             meibomian_grade = st.selectbox("**Meibomian Gland Expression**", 
-                                          ["0 - Clear", "1 - Cloudy", "2 - Granular", "3 - Toothpaste", "4 - No secretion"])
+                                          _MEIBOMIAN_GRADES)
             meiboscore = st.slider("**Meiboscore** (0-3)", 0, 3, 1,
                                   help="0=no loss, 1=≤25%, 2=26-50%, 3=>50% gland dropout")
         
@@ -529,162 +918,23 @@ def main():
         
         with st.expander("🔍 Additional Findings"):
             corneal_staining = st.selectbox("**Corneal Staining** (Oxford Scale)",
-                                           ["0 - None", "I - Mild", "II - Moderate", "III - Marked", "IV - Severe", "V - Extreme"])
+                                           _OXFORD_GRADES)
             conjunctival_staining = st.selectbox("**Conjunctival Staining** (Oxford Scale)",
-                                               ["0 - None", "I - Mild", "II - Moderate", "III - Marked", "IV - Severe", "V - Extreme"])
+                                               _OXFORD_GRADES)
     
-    # Store analysis results
-    tear_film_result = None
-    staining_result = None
+    # Analysis results kept in session state by the image tabs for the files currently uploaded,
+    # so sidebar reruns and the comprehensive report reuse them
+    tear_film_result = _session_result('tear_film_result', 'tear_film')
+    staining_result = _session_result('staining_result', 'staining')
     
     # Main content tabs
     tab1, tab2, tab3, tab4 = st.tabs(["📊 Tear Film Analysis", "🎯 Fluorescein Staining", "📈 Comprehensive Report", "📚 Guidelines"])
     
     with tab1:
-        st.markdown('<h2 class="section-header">🔬 Tear Film Interference Pattern Analysis</h2>', unsafe_allow_html=True)
-        
-        col1, col2 = st.columns([1, 1])
-        
-        with col1:
-            st.markdown('<div class="upload-section">', unsafe_allow_html=True)
-            uploaded_file = st.file_uploader("**Upload Slit Lamp Tear Film Image**", 
-                                           type=['jpg', 'jpeg', 'png'],
-                                           help="Upload a high-quality image of tear film interference patterns")
-            st.markdown('</div>', unsafe_allow_html=True)
-            
-            if uploaded_file is not None:
-                image = Image.open(uploaded_file)
-                st.image(image, caption="🖼️ Original Slit Lamp Image", use_column_width=True)
-        
-        with col2:
-            if uploaded_file is not None and st.button("🔍 Analyze Tear Film", type="primary", use_container_width=True):
-                with st.spinner("🔄 Analyzing tear film characteristics..."):
-                    # Enhanced analysis that varies by image
-                    tear_film_result = analyze_tear_film_pattern(image)
-                    
-                    # Simple image enhancement
-                    enhancer = ImageEnhance.Contrast(image)
-                    enhanced = enhancer.enhance(1.8)
-                    
-                    st.image(enhanced, caption="✨ Enhanced Interference Pattern", use_column_width=True)
-                    
-                    st.success("✅ Image analysis completed!")
-                    
-                    # Display DYNAMIC results
-                    st.markdown("### 📋 Analysis Results")
-                    col_a, col_b, col_c = st.columns(3)
-                    
-                    with col_a:
-                        st.markdown(f'<div class="metric-card">'
-                                  f'<div style="font-size: 1.2rem; font-weight: bold; color: #2e86ab;">Interference Grade</div>'
-                                  f'<div style="font-size: 1.5rem; font-weight: bold;">{tear_film_result["grade"]}</div>'
-                                  f'</div>', unsafe_allow_html=True)
-                    
-                    with col_b:
-                        st.markdown(f'<div class="metric-card">'
-                                  f'<div style="font-size: 1.2rem; font-weight: bold; color: #2e86ab;">Pattern Coverage</div>'
-                                  f'<div style="font-size: 1.5rem; font-weight: bold;">{tear_film_result["coverage"]:.1f}%</div>'
-                                  f'</div>', unsafe_allow_html=True)
-                    
-                    with col_c:
-                        st.markdown(f'<div class="metric-card">'
-                                  f'<div style="font-size: 1.2rem; font-weight: bold; color: #2e86ab;">Quality Score</div>'
-                                  f'<div style="font-size: 1.5rem; font-weight: bold;">{tear_film_result["quality_score"]}/10</div>'
-                                  f'</div>', unsafe_allow_html=True)
-                    
-                    # Interpretation
-                    st.markdown("### 💬 Clinical Interpretation")
-                    st.write(tear_film_result["interpretation"])
-                    
-                    # Color distribution chart - now dynamic
-                    colors = ['Blue', 'Green', 'Yellow', 'Red', 'Violet']
-                    distribution = [random.randint(15, 40) for _ in colors]
-                    total = sum(distribution)
-                    distribution = [d/total*100 for d in distribution]
-                    
-                    fig = px.pie(values=distribution,
-                               names=colors,
-                               title="🎨 Interference Color Distribution",
-                               color_discrete_sequence=px.colors.qualitative.Set3)
-                    st.plotly_chart(fig, use_container_width=True)
+        _tear_film_tab()
     
     with tab2:
-        st.markdown('<h2 class="section-header">🎯 Fluorescein Staining Analysis</h2>', unsafe_allow_html=True)
-        
-        st.info("""
-        **📝 Note:** This analysis is optimized for fluorescein images taken with blue light and yellow filter. 
-        The entire image appears green, with staining areas showing as brighter green/yellow spots.
-        **Improved:** Now excludes pupil (dark center) and sclera (white areas) from analysis.
-        """)
-        
-        col1, col2 = st.columns([1, 1])
-        
-        with col1:
-            st.markdown('<div class="upload-section">', unsafe_allow_html=True)
-            staining_file = st.file_uploader("**Upload Fluorescein Staining Image**", 
-                                           type=['jpg', 'jpeg', 'png'], 
-                                           key="staining",
-                                           help="Upload fluorescein staining image (blue light + yellow filter)")
-            st.markdown('</div>', unsafe_allow_html=True)
-            
-            if staining_file is not None:
-                image = Image.open(staining_file)
-                st.image(image, caption="🖼️ Original Fluorescein Image", use_column_width=True)
-        
-        with col2:
-            if staining_file is not None and st.button("🔍 Analyze Fluorescein Staining", type="primary", use_container_width=True):
-                with st.spinner("🔄 Analyzing fluorescein staining patterns..."):
-                    staining_result = analyze_fluorescein_staining(image)
-                    
-                    if staining_result:
-                        st.image(staining_result['processed_image'], 
-                                caption="🔴 Detected Staining Areas (Highlighted in Red) - Gray areas excluded", 
-                                use_column_width=True)
-                        
-                        st.success("✅ Fluorescein analysis completed!")
-                        
-                        # Staining assessment results - NOW DYNAMIC
-                        st.markdown("### 📊 Staining Assessment")
-                        col_a, col_b, col_c = st.columns(3)
-                        
-                        with col_a:
-                            st.markdown(f'<div class="metric-card">'
-                                      f'<div style="font-size: 1.2rem; font-weight: bold; color: #2e86ab;">Staining Grade</div>'
-                                      f'<div style="font-size: 1.5rem; font-weight: bold;">{staining_result["staining_grade"]}</div>'
-                                      f'</div>', unsafe_allow_html=True)
-                        
-                        with col_b:
-                            st.markdown(f'<div class="metric-card">'
-                                      f'<div style="font-size: 1.2rem; font-weight: bold; color: #2e86ab;">Staining Area</div>'
-                                      f'<div style="font-size: 1.5rem; font-weight: bold;">{staining_result["staining_percentage"]:.1f}%</div>'
-                                      f'</div>', unsafe_allow_html=True)
-                        
-                        with col_c:
-                            st.markdown(f'<div class="metric-card">'
-                                      f'<div style="font-size: 1.2rem; font-weight: bold; color: #2e86ab;">Lesion Count</div>'
-                                      f'<div style="font-size: 1.5rem; font-weight: bold;">{staining_result["lesion_count"]}</div>'
-                                      f'</div>', unsafe_allow_html=True)
-                        
-                        # Interpretation - NOW DYNAMIC
-                        st.markdown("### 💬 Clinical Interpretation")
-                        if staining_result['staining_percentage'] > 8:
-                            st.markdown(f'''
-                            <div class="warning-box">
-                                <strong>⚠️ {staining_result["interpretation"]}</strong><br>
-                                - Significant corneal epithelial damage detected<br>
-                                - Consider immediate evaluation by eye care specialist<br>
-                                - Anti-inflammatory therapy recommended
-                            </div>
-                            ''', unsafe_allow_html=True)
-                        else:
-                            st.markdown(f'''
-                            <div class="recommendation-box">
-                                <strong>✅ {staining_result["interpretation"]}</strong><br>
-                                - Regular lubrication therapy recommended<br>
-                                - Monitor for progression<br>
-                                - Follow up in 4-6 weeks
-                            </div>
-                            ''', unsafe_allow_html=True)
+        _staining_tab()
     
     with tab3:
         st.markdown('<h2 class="section-header">📈 Comprehensive Dry Eye Assessment</h2>', unsafe_allow_html=True)
@@ -692,13 +942,8 @@ def main():
         if st.button("🔄 Generate Complete Analysis", type="primary", use_container_width=True):
             with st.spinner("🔄 Generating comprehensive diagnosis..."):
                 # Calculate dry eye score
-                score = 0
-                if tbut < 10: score += 2
-                if tbut < 5: score += 1
-                if tmh < 0.3: score += 1
-                if schirmer < 10: score += 2
-                if osdi_score > 33: score += 2
-                if deq5_score > 8: score += 1
+                score = int(_SCORE_WEIGHTS @ (_SCORE_SIGNS * np.array([tbut, tbut, tmh, schirmer, osdi_score, deq5_score])
+                                              < _SCORE_SIGNS * _SCORE_LIMITS))
                 
                 # Determine diagnosis
                 if score >= 8:
@@ -717,71 +962,33 @@ def main():
                 with col1:
                     st.markdown("### 📋 Clinical Summary")
                     
-                    clinical_data = pd.DataFrame({
-                        'Parameter': ['TBUT', 'Tear Meniscus Height', 'Schirmer Test', 
-                                    'Meibomian Grade', 'Meiboscore', 'OSDI', 'DEQ-5',
-                                    'LIPCOF Nasal', 'LIPCOF Temporal'],
+                    clinical_data = {
+                        'Parameter': _STATUS_PARAMETERS,
                         'Value': [f"{tbut} s", f"{tmh} mm", f"{schirmer} mm/5min", 
                                 meibomian_grade, f"{meiboscore}/3", f"{osdi_score}/100", f"{deq5_score}/22",
                                 f"{lipcof_nasal}/3", f"{lipcof_temporal}/3"],
-                        'Status': [
-                            '✅ Normal' if tbut >= 10 else '⚠️ Low',
-                            '✅ Normal' if tmh >= 0.3 else '⚠️ Low',
-                            '✅ Normal' if schirmer >= 10 else '⚠️ Low',
-                            '✅ Normal' if "0" in meibomian_grade or "1" in meibomian_grade else '⚠️ Abnormal',
-                            '✅ Normal' if meiboscore <= 1 else '⚠️ Abnormal',
-                            '✅ Normal' if osdi_score <= 22 else '⚠️ High',
-                            '✅ Normal' if deq5_score <= 6 else '⚠️ High',
-                            '✅ Normal' if lipcof_nasal <= 1 else '⚠️ Abnormal',
-                            '✅ Normal' if lipcof_temporal <= 1 else '⚠️ Abnormal'
-                        ]
-                    })
+                        'Status': np.where(
+                            _STATUS_SIGNS * np.array([tbut, tmh, schirmer, int(meibomian_grade[0]), meiboscore,
+                                                      osdi_score, deq5_score, lipcof_nasal, lipcof_temporal])
+                            <= _STATUS_SIGNS * _STATUS_LIMITS,
+                            '✅ Normal', _STATUS_FLAGS).tolist()
+                    }
                     
-                    # Style the dataframe
-                    st.dataframe(clinical_data, use_container_width=True, hide_index=True)
+                    # Static summary, so a plain table instead of the interactive dataframe grid
+                    st.table(clinical_data, hide_index=True)
                     
                     st.markdown("### 🎯 Diagnosis")
                     
-                    col_diag1, col_diag2 = st.columns(2)
-                    with col_diag1:
-                        st.markdown(f'<div class="metric-card">'
-                                  f'<div style="font-size: 1.2rem; font-weight: bold; color: #2e86ab;">Dry Eye Type</div>'
-                                  f'<div style="font-size: 1.5rem; font-weight: bold;">{diagnosis}</div>'
-                                  f'</div>', unsafe_allow_html=True)
-                    
-                    with col_diag2:
-                        st.markdown(f'<div class="metric-card">'
-                                  f'<div style="font-size: 1.2rem; font-weight: bold; color: #2e86ab;">Severity Level</div>'
-                                  f'<div style="font-size: 1.5rem; font-weight: bold;">{severity}</div>'
-                                  f'</div>', unsafe_allow_html=True)
+                    st.markdown(_metric_cards([
+                        ('Dry Eye Type', diagnosis),
+                        ('Severity Level', severity)
+                    ]), unsafe_allow_html=True)
                     
                     # Severity gauge
                     severity_levels = {'None': 0, 'Mild': 1, 'Moderate': 2, 'Severe': 3}
                     current_severity = severity_levels.get(severity, 0)
                     
-                    fig_gauge = go.Figure(go.Indicator(
-                        mode="gauge+number+delta",
-                        value=current_severity,
-                        domain={'x': [0, 1], 'y': [0, 1]},
-                        title={'text': "🩺 Disease Severity", 'font': {'size': 20}},
-                        gauge={
-                            'axis': {'range': [0, 3], 'tickvals': [0, 1, 2, 3], 
-                                   'ticktext': ['None', 'Mild', 'Moderate', 'Severe']},
-                            'bar': {'color': "darkblue"},
-                            'steps': [
-                                {'range': [0, 1], 'color': "lightgreen"},
-                                {'range': [1, 2], 'color': "yellow"},
-                                {'range': [2, 3], 'color': "red"}
-                            ],
-                            'threshold': {
-                                'line': {'color': "black", 'width': 4},
-                                'thickness': 0.75,
-                                'value': current_severity
-                            }
-                        }
-                    ))
-                    fig_gauge.update_layout(height=300, font={'size': 12})
-                    st.plotly_chart(fig_gauge, use_container_width=True)
+                    st.plotly_chart(_severity_gauge(current_severity), use_container_width=True)
                 
                 with col2:
                     st.markdown("### 💡 Treatment Recommendations")
@@ -797,10 +1004,11 @@ def main():
                         tear_film_result, staining_result, clinical_params
                     )
                     
-                    for i, recommendation in enumerate(recommendations, 1):
-                        st.markdown(f'<div class="recommendation-box">'
-                                  f'<strong>#{i}</strong> {recommendation}'
-                                  f'</div>', unsafe_allow_html=True)
+                    # All cards in one markdown element instead of one message per recommendation
+                    st.markdown(''.join(f'<div class="recommendation-box">'
+                                        f'<strong>#{i}</strong> {recommendation}'
+                                        f'</div>' for i, recommendation in enumerate(recommendations, 1)),
+                              unsafe_allow_html=True)
                     
                     # TFOS guidance
                     st.markdown("### 📖 TFOS DEWS III Guidance")
@@ -834,63 +1042,21 @@ def main():
         col1, col2 = st.columns([1, 1])
         
         with col1:
-            st.markdown("""
-            ### 🔍 Key Diagnostic Criteria
-            
-            **Aqueous Deficient Dry Eye (ADDE):**
-            - Schirmer test ≤ 5 mm/5min
-            - Reduced tear meniscus height (< 0.2 mm)
-            - Normal TBUT
-            
-            **Evaporative Dry Eye (EDE):**
-            - TBUT ≤ 5 seconds
-            - Meibomian gland dysfunction  
-            - Normal Schirmer test
-            
-            **Mixed Dry Eye:**
-            - Features of both ADDE and EDE
-            """)
+            st.markdown(_DIAGNOSTIC_CRITERIA_MD)
         
         with col2:
             st.markdown("""
             ### 🎯 Severity Grading
             """)
             
-            severity_data = pd.DataFrame({
-                'Mild': ['≤10s', '≤10mm', 'Mild & transient', 'Mild & episodic'],
-                'Moderate': ['≤5s', '≤5mm', 'Moderate marked', 'Moderate chronic'], 
-                'Severe': ['Immediate', '≤2mm', 'Severe persistent', 'Severe constant']
-            }, index=['TBUT', 'Schirmer', 'Corneal Staining', 'Symptoms'])
-            
-            st.dataframe(severity_data, use_container_width=True)
+            # Small fixed reference table, so a plain table instead of the interactive dataframe grid
+            st.table(_SEVERITY_GRADING, hide_index=True)
         
-        st.markdown("""
-        ### 📋 Diagnostic Workflow
-        1. **Step 1:** Symptom assessment (OSDI/DEQ-5)
-        2. **Step 2:** Tear film stability (TBUT)
-        3. **Step 3:** Tear volume assessment (TMH/Schirmer)
-        4. **Step 4:** Ocular surface damage (staining)
-        5. **Step 5:** Meibomian gland evaluation
-        
-        *Reference: TFOS DEWS III Diagnostic Methodology Report, June 2025*
-        """)
+        st.markdown(_DIAGNOSTIC_WORKFLOW_MD)
+    
+    # Footer with updated disclaimer
+    st.markdown("---")
+    st.markdown(_FOOTER_HTML, unsafe_allow_html=True)
 
 if __name__ == "__main__":
-    main()
-
-# Footer with updated disclaimer
-st.markdown("---")
-st.markdown("""
-<div style="text-align: center; color: #666; padding: 2rem;">
-    <div style="font-size: 2rem; font-weight: 800; color: #1f77b4; margin-bottom: 0.5rem; letter-spacing: 2px;">
-        TEARFILM ANALYZER
-    </div>
-    <div style="font-size: 1.2rem; margin-bottom: 1rem;">
-        TFOS DEWS III Based Diagnostic System
-    </div>
-    <p><strong>For professional use only.</strong></p>
-    <p><em>This system provides diagnostic support and recommendations. Final diagnosis and treatment decisions should be made by qualified eye care specialists (ophthalmologists or optometrists).</em></p>
-    <p>© 2024 Toni Mandusic. All rights reserved.</p>
-    <p>Reference: TFOS DEWS III Reports, June 2025</p>
-</div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+    main()
\ No newline at end of file
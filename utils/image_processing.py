@@ -1,6 +1,5 @@
 import cv2
 import numpy as np
-from scipy import ndimage
 from skimage import filters, measure, color
 import streamlit as st
 
@@ -9,14 +8,12 @@ def analyze_tear_film_interference(image):
     Analyze tear film interference patterns based on TFOS DEWS III guidelines
     """
     try:
-        # Convert to RGB if BGR
+        # Enhance contrast using CLAHE - BGR input goes straight to LAB instead of
+        # through an intermediate RGB copy
         if len(image.shape) == 3 and image.shape[2] == 3:
-            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
         else:
-            rgb_image = image
-        
-        # Enhance contrast using CLAHE
-        lab = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2LAB)
+            lab = cv2.cvtColor(image, cv2.COLOR_RGB2LAB)
         lab[:,:,0] = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8)).apply(lab[:,:,0])
         enhanced = cv2.cvtColor(lab, cv2.COLOR_LAB2RGB)
         
@@ -34,11 +31,13 @@ def analyze_tear_film_interference(image):
         color_count = {}
         total_pixels = hsv.shape[0] * hsv.shape[1]
         
+        # All ranges share the same saturation/value floor, so classify every pixel in
+        # one pass: histogram the hue of the qualifying pixels, then sum each hue range
+        saturated = cv2.inRange(hsv, np.array([0, 50, 50], dtype=np.uint8), np.array([180, 255, 255], dtype=np.uint8))
+        hue_hist = cv2.calcHist([hsv], [0], saturated, [180], [0, 180]).ravel().astype(np.int64)
+        
         for color_name, (lower, upper) in color_ranges.items():
-            lower = np.array(lower, dtype=np.uint8)
-            upper = np.array(upper, dtype=np.uint8)
-            mask = cv2.inRange(hsv, lower, upper)
-            color_percentage = np.sum(mask > 0) / total_pixels * 100
+            color_percentage = hue_hist[lower[0]:upper[0] + 1].sum() / total_pixels * 100
             if color_percentage > 1:  # Only count significant colors
                 color_count[color_name] = color_percentage
         